@@ -0,0 +1,7 @@
+"""
+Email notifiers for the shift codes scraper.
+Each module exposes send(recipient_emails, subject, html_body, plain_text_body, session)
+and a REQUIRED_ENV tuple of environment variables checked before the email is rendered.
+Provider-specific dependencies are imported lazily, so only the configured provider is loaded.
+Providers should deliver to all recipients in one API call where their API allows batching.
+"""
@@ -0,0 +1,60 @@
+"""
+Mailjet notifier (free tier: 6,000 emails/month).
+"""
+
+import os
+from typing import List
+
+SEND_URL = "https://api.mailjet.com/v3.1/send"
+REQUIRED_ENV = ('MAILJET_API_KEY', 'MAILJET_API_SECRET')
+# Mailjet accepts at most 50 messages per send request
+MAX_MESSAGES_PER_REQUEST = 50
+
+
+def send(recipient_emails: List[str], subject: str, html_body: str, plain_text_body: str, session):
+    """
+    Send email using Mailjet API.
+    Sends one message per recipient, batching up to MAX_MESSAGES_PER_REQUEST messages per request.
+    """
+    api_key = os.getenv('MAILJET_API_KEY')
+    api_secret = os.getenv('MAILJET_API_SECRET')
+
+    from_email = os.getenv('MAILJET_FROM_EMAIL', recipient_emails[0])
+    from_name = os.getenv('MAILJET_FROM_NAME', 'Borderlands Monitor')
+
+    for start in range(0, len(recipient_emails), MAX_MESSAGES_PER_REQUEST):
+        batch = recipient_emails[start:start + MAX_MESSAGES_PER_REQUEST]
+        data = {
+            'Messages': [
+                {
+                    'From': {
+                        'Email': from_email,
+                        'Name': from_name
+                    },
+                    'To': [
+                        {
+                            'Email': recipient_email
+                        }
+                    ],
+                    'Subject': subject,
+                    'TextPart': plain_text_body,
+                    'HTMLPart': html_body,
+                    'ReplyTo': {
+                        'Email': from_email,
+                        'Name': from_name
+                    }
+                }
+                for recipient_email in batch
+            ]
+        }
+
+        try:
+            result = session.post(SEND_URL, json=data, auth=(api_key, api_secret), timeout=30)
+            status_code = result.status_code
+            if status_code == 200:
+                print(f"Email sent successfully via Mailjet to {len(batch)} recipient(s). Status: {status_code}")
+            else:
+                print(f"Email sent via Mailjet with status: {status_code}")
+                print(f"Response: {result.json()}")
+        except Exception as e:
+            print(f"Error sending email via Mailjet: {e}")
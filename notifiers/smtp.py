@@ -0,0 +1,82 @@
+"""
+SMTP notifier (e.g. Gmail with an App Password).
+"""
+
+import os
+import atexit
+import smtplib
+from email.message import EmailMessage
+from typing import List
+
+REQUIRED_ENV = ('SMTP_SERVER', 'SMTP_USER', 'SMTP_PASSWORD')
+
+# Connection reused across sends; reopened if the server has dropped it
+_smtp_conn = None
+
+
+def _get_smtp() -> smtplib.SMTP:
+    """Return the open SMTP connection, connecting (STARTTLS + login) if needed."""
+    global _smtp_conn
+
+    if _smtp_conn is not None:
+        try:
+            if _smtp_conn.noop()[0] == 250:
+                return _smtp_conn
+        except (smtplib.SMTPException, OSError):
+            pass
+        _smtp_conn = None
+
+    server = smtplib.SMTP(os.getenv('SMTP_SERVER'), int(os.getenv('SMTP_PORT') or 587), timeout=30)
+    try:
+        server.starttls()
+        server.login(os.getenv('SMTP_USER'), os.getenv('SMTP_PASSWORD'))
+    except Exception:
+        server.close()
+        raise
+    _smtp_conn = server
+    return _smtp_conn
+
+
+@atexit.register
+def _close_smtp():
+    """Close the SMTP connection on exit."""
+    if _smtp_conn is not None:
+        try:
+            _smtp_conn.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+
+
+def send(recipient_emails: List[str], subject: str, html_body: str, plain_text_body: str, session):
+    """
+    Send email over SMTP.
+    All messages go out back-to-back over one connection instead of reconnecting per recipient.
+    """
+    from_email = os.getenv('SMTP_FROM_EMAIL') or os.getenv('SMTP_USER')
+
+    try:
+        server = _get_smtp()
+    except Exception as e:
+        print(f"Error sending email via SMTP: {e}")
+        return
+
+    sent = 0
+    for recipient_email in recipient_emails:
+        msg = EmailMessage()
+        msg['Subject'] = subject
+        msg['From'] = from_email
+        msg['To'] = recipient_email
+        msg.set_content(plain_text_body)
+        msg.add_alternative(html_body, subtype='html')
+        try:
+            # Re-check (and reopen if needed) the connection after a failed send
+            if server is None:
+                server = _get_smtp()
+            server.send_message(msg)
+            sent += 1
+        except Exception as e:
+            print(f"Error sending email via SMTP to {recipient_email}: {e}")
+            server = None
+
+    if sent:
+        print(f"Email sent successfully via SMTP to {sent} recipient(s)")
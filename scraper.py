@@ -5,12 +5,16 @@ Scrapes shift codes from MentalMars and sends email notifications for new codes.
 """
 
 import os
-import json
-import re
-import requests
-from bs4 import BeautifulSoup
+import sys
+import codecs
+import functools
+import importlib
+import pkgutil
+import orjson
 from datetime import datetime
-from typing import List, Dict, Set
+from typing import Iterable, List, Dict, NamedTuple, Optional, Set, Tuple
+
+import notifiers
 
 # Load environment variables from .env file if it exists
 try:
@@ -23,266 +27,470 @@ except ImportError:
 # Configuration
 URL = "https://mentalmars.com/game-news/borderlands-4-shift-codes/"
 STATE_FILE = "known_codes.json"
+# HTTP cache validators persisted in the state file, mapped to their conditional request headers
+CACHE_VALIDATORS = {
+    'etag': ('ETag', 'If-None-Match'),
+    'last_modified': ('Last-Modified', 'If-Modified-Since'),
+}
+# Heading of the codes table, lowercased for case-insensitive matching
+HEADING_TEXT = "every borderlands 4 shift code for golden keys"
 HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept-Encoding": "gzip"
 }
 
 
-def load_known_codes() -> Set[str]:
-    """Load previously seen codes from state file."""
+class ShiftCode(NamedTuple):
+    """A shift code row from the codes table."""
+    code: str
+    reward: str
+    added_date: str
+    expire_date: str
+
+
+# Characters allowed in a shift code group
+_CODE_CHARS = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789')
+
+# Fingerprint of the state as last loaded from / written to STATE_FILE
+_STATE_FINGERPRINT = None
+
+
+def _state_fingerprint(codes: Set[str], validators: Dict[str, str]) -> int:
+    """Hash the saved state so unchanged state can skip the write."""
+    return hash((frozenset(codes), frozenset(validators.items())))
+
+
+def load_known_codes() -> Tuple[Set[str], Dict[str, str]]:
+    """
+    Load previously seen codes from state file.
+    Returns the set of codes and the cache validators (etag, last_modified) of the last fetch.
+    """
+    global _STATE_FINGERPRINT
+
     if os.path.exists(STATE_FILE):
         try:
-            with open(STATE_FILE, 'r') as f:
-                data = json.load(f)
-                return set(data.get('codes', []))
-        except (json.JSONDecodeError, KeyError):
-            return set()
-    return set()
+            with open(STATE_FILE, 'rb') as f:
+                data = orjson.loads(f.read())
+                codes = set(data.get('codes', []))
+                validators = {key: data[key] for key in CACHE_VALIDATORS if data.get(key)}
+                _STATE_FINGERPRINT = _state_fingerprint(codes, validators)
+                return codes, validators
+        except (orjson.JSONDecodeError, KeyError):
+            return set(), {}
+    return set(), {}
+
+
+def save_known_codes(codes: Set[str], validators: Dict[str, str]):
+    """
+    Save known codes and the page's cache validators to state file.
+    Skips the write if nothing changed since the last load/save; otherwise
+    writes to a temporary file and swaps it in, so a crash can't leave a truncated state file.
+    """
+    global _STATE_FINGERPRINT
 
+    fingerprint = _state_fingerprint(codes, validators)
+    if fingerprint == _STATE_FINGERPRINT:
+        return
 
-def save_known_codes(codes: Set[str]):
-    """Save known codes to state file."""
     data = {
         'codes': list(codes),
+        **validators,
         'last_updated': datetime.now().isoformat()
     }
-    with open(STATE_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+    tmp_file = STATE_FILE + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS))
+    os.replace(tmp_file, STATE_FILE)
+    _STATE_FINGERPRINT = fingerprint
 
 
-def extract_shift_codes(html: str) -> List[Dict[str, str]]:
+@functools.lru_cache(maxsize=None)
+def _get_session():
+    """
+    Create the shared HTTP session so connections (TCP + TLS) are reused between requests.
+    requests is imported here so formatting-only callers don't pay for it.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    session.mount('https://', HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=10,
+        max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+    ))
+    return session
+
+
+@functools.lru_cache(maxsize=None)
+def _get_xpaths():
+    """
+    Compile the XPath queries for the codes table once.
+    Returns the heading, table, rows, cells and code queries.
+    """
+    from lxml import etree
+
+    return (
+        # Heading "Every Borderlands 4 SHiFT Code for Golden Keys", matched case-insensitively
+        etree.XPath(
+            "(//h2[contains("
+            "translate(normalize-space(.), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), "
+            f"'{HEADING_TEXT}')])[1]"
+        ),
+        etree.XPath("following::figure[1]/descendant::table[1]"),
+        etree.XPath("descendant::tr[position() > 1]"),  # Skip header
+        etree.XPath("descendant::td"),
+        etree.XPath("descendant::code[1]"),
+    )
+
+
+@functools.lru_cache(maxsize=2)
+def _parse(html: str):
+    """
+    Parse the page HTML into an lxml tree.
+    Cached so extracting several tables from the same page parses it only once.
+    """
+    from lxml import html as lxml_html
+
+    # The text is already decoded, so parse it as UTF-8 bytes and ignore any encoding declared in the page
+    # (lxml rejects str input that starts with an XML declaration naming an encoding)
+    parser = lxml_html.HTMLParser(encoding='utf-8')
+    return lxml_html.fromstring(html.encode('utf-8', 'replace'), parser=parser)
+
+
+def _is_valid_code(code: str) -> bool:
+    """Check that a code matches the XXXXX-XXXXX-XXXXX-XXXXX-XXXXX format."""
+    parts = code.split('-')
+    return len(parts) == 5 and all(len(part) == 5 and _CODE_CHARS.issuperset(part) for part in parts)
+
+
+def extract_shift_codes(html: str) -> List[ShiftCode]:
     """
     Extract shift codes from the HTML page.
-    Returns a list of dictionaries with code, reward, added_date, and expire_date.
+    Returns a list of ShiftCode tuples with code, reward, added_date, and expire_date.
     """
-    soup = BeautifulSoup(html, 'html.parser')
-    codes = []
+    from lxml import etree
+
+    heading_xpath, table_xpath, _, _, _ = _get_xpaths()
+    try:
+        doc = _parse(html)
+    except etree.LxmlError:
+        # Empty or unparseable document
+        doc = None
 
     # Find the main table for "Every Borderlands 4 SHiFT Code for Golden Keys"
     # Look for the heading first, then find the table after it
-    heading = soup.find('h2', string=re.compile('Every Borderlands 4 SHiFT Code for Golden Keys', re.I))
+    heading = heading_xpath(doc) if doc is not None else []
 
     if not heading:
         print("Warning: Could not find the main shift codes table heading")
-        return codes
+        return []
 
     # Find the table after the heading
-    table = heading.find_next('figure')
-    if table:
-        table = table.find('table')
+    table = table_xpath(heading[0])
 
     if not table:
         print("Warning: Could not find the shift codes table")
-        return codes
+        return []
+
+    return _extract_rows(table[0])
+
+
+@functools.lru_cache(maxsize=None)
+def _lxml_encoding(encoding: Optional[str]) -> Optional[str]:
+    """
+    Map a charset name from the Content-Type header to one libxml2 understands.
+    Returns None if it doesn't, so lxml falls back to the BOM or <meta charset>.
+    """
+    from lxml import etree
+
+    if not encoding:
+        return None
+    try:
+        name = codecs.lookup(encoding).name
+    except LookupError:
+        return None
+
+    # Pages labelled ASCII often contain UTF-8; UTF-8 decodes the ASCII part identically
+    if name == 'ascii':
+        return 'utf-8'
+
+    try:
+        etree.HTMLPullParser(encoding=name)
+    except LookupError:
+        return None
+    return name
+
+
+def extract_shift_codes_stream(chunks: Iterable[bytes], encoding: Optional[str] = None) -> List[ShiftCode]:
+    """
+    Extract shift codes from the HTML page while it is being downloaded.
+    Feeds the chunks to an incremental parser and stops reading once the codes table is complete.
+    Returns the same list of ShiftCode tuples as extract_shift_codes.
+    """
+    from lxml import etree, html as lxml_html
+
+    parser = etree.HTMLPullParser(events=('start', 'end'), encoding=_lxml_encoding(encoding))
+    parser.set_element_class_lookup(lxml_html.HtmlElementClassLookup())
+
+    def events():
+        for chunk in chunks:
+            parser.feed(chunk)
+            yield from parser.read_events()
+        try:
+            parser.close()
+        except etree.LxmlError:
+            # Empty or unparseable document
+            return
+        yield from parser.read_events()
+
+    heading_found = False
+    figure = None
+
+    for event, element in events():
+        if not heading_found:
+            # Find the main table for "Every Borderlands 4 SHiFT Code for Golden Keys"
+            if event == 'end' and element.tag == 'h2':
+                heading_found = HEADING_TEXT in ' '.join(element.text_content().split()).lower()
+        elif figure is None:
+            # The table is inside the first figure after the heading
+            if event == 'start' and element.tag == 'figure':
+                figure = element
+        elif event == 'end':
+            if element.tag == 'table' and figure in element.iterancestors('figure'):
+                return _extract_rows(element)
+            if element is figure:
+                break
+
+    if not heading_found:
+        print("Warning: Could not find the main shift codes table heading")
+    else:
+        print("Warning: Could not find the shift codes table")
+    return []
 
-    # Extract rows (skip header row)
-    rows = table.find_all('tr')[1:]  # Skip header
 
-    for row in rows:
-        cells = row.find_all('td')
+def _extract_rows(table) -> List[ShiftCode]:
+    """Extract the codes from the rows of the shift codes table."""
+    _, _, rows_xpath, cells_xpath, code_xpath = _get_xpaths()
+    codes = []
+
+    for row in rows_xpath(table):
+        cells = cells_xpath(row)
         if len(cells) >= 4:
-            reward = cells[0].get_text(strip=True)
-            added_date = cells[1].get_text(strip=True)
+            # Rewards and dates repeat across rows, so share one string per value
+            reward = sys.intern(cells[0].text_content().strip())
+            added_date = sys.intern(cells[1].text_content().strip())
 
             # Extract code from the code tag
-            code_elem = cells[2].find('code')
+            code_elem = code_xpath(cells[2])
             if code_elem:
-                code = code_elem.get_text(strip=True)
+                code = code_elem[0].text_content().strip()
                 # Validate code format (should be like: XXXX-XXXX-XXXX-XXXX-XXXX)
-                if re.match(r'^[A-Z0-9]{5}-[A-Z0-9]{5}-[A-Z0-9]{5}-[A-Z0-9]{5}-[A-Z0-9]{5}$', code):
-                    expire_date = cells[3].get_text(strip=True)
-                    codes.append({
-                        'code': code,
-                        'reward': reward,
-                        'added_date': added_date,
-                        'expire_date': expire_date
-                    })
+                if _is_valid_code(code):
+                    expire_date = sys.intern(cells[3].text_content().strip())
+                    codes.append(ShiftCode(code, reward, added_date, expire_date))
 
     return codes
 
 
-def send_email_notification(new_codes: List[Dict[str, str]], recipient_email: str):
+def send_email_notification(new_codes: List[ShiftCode], recipient_emails: List[str]):
     """
-    Send email notification with new shift codes using Mailjet.
+    Send email notification with new shift codes using the provider set in EMAIL_PROVIDER.
+    All recipients are sent in a single batched API call.
     """
-    if not new_codes:
+    if not new_codes or not recipient_emails:
         return
 
-    send_via_mailjet(new_codes, recipient_email)
-
-
-def send_via_mailjet(new_codes: List[Dict[str, str]], recipient_email: str):
-    """Send email using Mailjet API."""
-    from mailjet_rest import Client
-
-    api_key = os.getenv('MAILJET_API_KEY')
-    api_secret = os.getenv('MAILJET_API_SECRET')
-
-    if not api_key or not api_secret:
-        print("Error: MAILJET_API_KEY and MAILJET_API_SECRET must be set")
+    provider = os.getenv('EMAIL_PROVIDER') or 'mailjet'
+    if provider not in {module.name for module in pkgutil.iter_modules(notifiers.__path__)}:
+        print(f"Error: Unsupported EMAIL_PROVIDER '{provider}'")
         return
+    notifier = importlib.import_module(f'notifiers.{provider}')
 
-    mailjet = Client(auth=(api_key, api_secret), version='v3.1')
+    # Don't render the email if the provider can't send it
+    missing = [name for name in notifier.REQUIRED_ENV if not os.getenv(name)]
+    if missing:
+        print(f"Error: {', '.join(missing)} must be set")
+        return
 
     # Less spammy subject line (removed emoji)
     subject = f"New Borderlands 4 Shift Codes Available ({len(new_codes)} new)"
 
+    # Render once; the notifier only delivers the finished bodies
     html_body = format_email_body(new_codes)
     plain_text_body = format_email_body_plain(new_codes)
 
-    from_email = os.getenv('MAILJET_FROM_EMAIL', recipient_email)
-    from_name = os.getenv('MAILJET_FROM_NAME', 'Borderlands Monitor')
+    notifier.send(recipient_emails, subject, html_body, plain_text_body, _get_session())
 
-    data = {
-        'Messages': [
-            {
-                'From': {
-                    'Email': from_email,
-                    'Name': from_name
-                },
-                'To': [
-                    {
-                        'Email': recipient_email
-                    }
-                ],
-                'Subject': subject,
-                'TextPart': plain_text_body,
-                'HTMLPart': html_body,
-                'ReplyTo': {
-                    'Email': from_email,
-                    'Name': from_name
-                }
-            }
-        ]
-    }
 
-    try:
-        result = mailjet.send.create(data=data)
-        status_code = result.status_code
-        if status_code == 200:
-            print(f"Email sent successfully via Mailjet. Status: {status_code}")
-        else:
-            print(f"Email sent via Mailjet with status: {status_code}")
-            print(f"Response: {result.json()}")
-    except Exception as e:
-        print(f"Error sending email via Mailjet: {e}")
-
-
-def format_email_body(new_codes: List[Dict[str, str]]) -> str:
-    """Format the email body as HTML."""
-    html = f"""
+# Static parts of the HTML email, built once at import
+_EMAIL_HEAD = """
     <html>
     <head>
         <style>
-            body {{ font-family: Arial, sans-serif; }}
-            .code {{
+            body { font-family: Arial, sans-serif; }
+            .code {
                 font-family: monospace;
                 background-color: #f4f4f4;
                 padding: 10px;
                 border-radius: 5px;
                 margin: 10px 0;
-            }}
-            .code-block {{
+            }
+            .code-block {
                 background-color: #ffffff;
                 border: 1px solid #ddd;
                 border-radius: 5px;
                 padding: 15px;
                 margin: 10px 0;
-            }}
-            h2 {{ color: #333; }}
-            .reward {{ font-weight: bold; color: #0066cc; }}
-            .date {{ color: #666; font-size: 0.9em; }}
+            }
+            h2 { color: #333; }
+            .reward { font-weight: bold; color: #0066cc; }
+            .date { color: #666; font-size: 0.9em; }
         </style>
     </head>
     <body>
         <h2>🎮 New Borderlands 4 Shift Codes!</h2>
-        <p>Found <strong>{len(new_codes)}</strong> new shift code(s):</p>
-    """
+"""
 
-    for code_info in new_codes:
-        html += f"""
+# Row templates read the ShiftCode's fields as attributes of the single positional argument
+_ROW_TMPL = """
         <div class="code-block">
-            <div class="reward">{code_info['reward']}</div>
-            <div class="code">{code_info['code']}</div>
+            <div class="reward">{0.reward}</div>
+            <div class="code">{0.code}</div>
             <div class="date">
-                Added: {code_info['added_date']} |
-                Expires: {code_info['expire_date']}
+                Added: {0.added_date} |
+                Expires: {0.expire_date}
             </div>
         </div>
         """
 
-    html += """
+_EMAIL_FOOT = """
         <p><a href="https://shift.gearboxsoftware.com/rewards">Redeem codes on the Official SHiFT Website</a></p>
         <p><small>Source: <a href="https://mentalmars.com/game-news/borderlands-4-shift-codes/">MentalMars</a></small></p>
     </body>
     </html>
     """
 
-    return html
+# Static parts of the plain text email
+_PLAIN_ROW_TMPL = "{0.reward}\nCode: {0.code}\nAdded: {0.added_date} | Expires: {0.expire_date}\n\n"
 
+_PLAIN_FOOT = (
+    "Redeem codes on the Official SHiFT Website:\n"
+    "https://shift.gearboxsoftware.com/rewards\n\n"
+    "Source: https://mentalmars.com/game-news/borderlands-4-shift-codes/\n"
+)
 
-def format_email_body_plain(new_codes: List[Dict[str, str]]) -> str:
-    """Format the email body as plain text."""
-    text = f"New Borderlands 4 Shift Codes Available!\n\n"
-    text += f"Found {len(new_codes)} new shift code(s):\n\n"
 
-    for code_info in new_codes:
-        text += f"{code_info['reward']}\n"
-        text += f"Code: {code_info['code']}\n"
-        text += f"Added: {code_info['added_date']} | Expires: {code_info['expire_date']}\n\n"
+def format_email_body(new_codes: List[ShiftCode]) -> str:
+    """Format the email body as HTML."""
+    header_line = f"""        <p>Found <strong>{len(new_codes)}</strong> new shift code(s):</p>
+    """
+    body_rows = "".join(_ROW_TMPL.format(code_info) for code_info in new_codes)
+
+    return _EMAIL_HEAD + header_line + body_rows + _EMAIL_FOOT
 
-    text += "Redeem codes on the Official SHiFT Website:\n"
-    text += "https://shift.gearboxsoftware.com/rewards\n\n"
-    text += "Source: https://mentalmars.com/game-news/borderlands-4-shift-codes/\n"
 
-    return text
+def format_email_body_plain(new_codes: List[ShiftCode]) -> str:
+    """Format the email body as plain text."""
+    parts = [
+        "New Borderlands 4 Shift Codes Available!\n\n",
+        f"Found {len(new_codes)} new shift code(s):\n\n"
+    ]
+    for code_info in new_codes:
+        parts.append(_PLAIN_ROW_TMPL.format(code_info))
+    parts.append(_PLAIN_FOOT)
+
+    return "".join(parts)
 
 
 def main():
     """Main function to scrape codes and send notifications."""
+    import requests
+    from lxml import etree
+
     print(f"Starting scrape at {datetime.now()}")
 
-    # Get recipient email from environment
-    recipient_email = os.getenv('RECIPIENT_EMAIL')
-    if not recipient_email:
+    # Get recipient emails (comma-separated) from environment
+    recipient_emails = [email.strip() for email in os.getenv('RECIPIENT_EMAIL', '').split(',') if email.strip()]
+    if not recipient_emails:
         print("Warning: RECIPIENT_EMAIL not set. Email notifications will be skipped.")
 
     # Load known codes
-    known_codes = load_known_codes()
+    known_codes, validators = load_known_codes()
     print(f"Loaded {len(known_codes)} known codes")
 
-    # Fetch the page
+    # Fetch the page, letting the server answer 304 if it hasn't changed since the last run
+    request_headers = {
+        request_header: validators[key]
+        for key, (_, request_header) in CACHE_VALIDATORS.items()
+        if key in validators
+    }
     try:
-        response = requests.get(URL, headers=HEADERS, timeout=30)
-        response.raise_for_status()
+        response = _get_session().get(URL, headers=request_headers, timeout=30, stream=True)
     except requests.RequestException as e:
         print(f"Error fetching page: {e}")
         return
 
-    # Extract codes
-    codes = extract_shift_codes(response.text)
+    with response:
+        try:
+            response.raise_for_status()
+        except requests.RequestException as e:
+            print(f"Error fetching page: {e}")
+            return
+
+        if response.status_code == 304:
+            print("Page not modified since last check, no new codes")
+            print(f"Scrape completed at {datetime.now()}")
+            return
+
+        # Extract codes while the page downloads, stopping once the codes table has been read
+        try:
+            codes = extract_shift_codes_stream(response.iter_content(chunk_size=16384), response.encoding)
+        except requests.RequestException as e:
+            print(f"Error fetching page: {e}")
+            return
+        except (LookupError, etree.LxmlError) as e:
+            print(f"Error parsing page: {e}")
+            return
     print(f"Found {len(codes)} codes on the page")
 
-    # Find new codes
-    new_codes = [code for code in codes if code['code'] not in known_codes]
+    # Only store the page's cache validators once its codes table was found and parsed;
+    # otherwise keep the old ones so the next run fetches and parses the page again
+    if codes:
+        new_validators = {
+            key: response.headers[response_header]
+            for key, (response_header, _) in CACHE_VALIDATORS.items()
+            if response_header in response.headers
+        }
+    else:
+        new_validators = validators
+
+    # Find new codes (keyed by code, keeping page order)
+    fetched_codes = {code_info.code: code_info for code_info in codes}
+    new_code_ids = fetched_codes.keys() - known_codes
+    new_codes = [code_info for code, code_info in fetched_codes.items() if code in new_code_ids]
 
     if new_codes:
         print(f"Found {len(new_codes)} new code(s):")
         for code_info in new_codes:
-            print(f"  - {code_info['code']} ({code_info['reward']})")
+            print(f"  - {code_info.code} ({code_info.reward})")
 
         # Update known codes
-        for code_info in new_codes:
-            known_codes.add(code_info['code'])
-        save_known_codes(known_codes)
+        known_codes |= new_code_ids
+        save_known_codes(known_codes, new_validators)
 
         # Send email notification
-        if recipient_email:
-            send_email_notification(new_codes, recipient_email)
+        if recipient_emails:
+            send_email_notification(new_codes, recipient_emails)
         else:
             print("Skipping email notification (RECIPIENT_EMAIL not set)")
     else:
         print("No new codes found")
+        # Nothing to update if the codes table couldn't be parsed (validators stay as loaded)
+        if codes:
+            save_known_codes(known_codes, new_validators)
 
     print(f"Scrape completed at {datetime.now()}")
 
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Test script to verify shift code validation matches the documented format.
+"""
+
+import re
+from scraper import _is_valid_code
+
+# Reference grammar: XXXXX-XXXXX-XXXXX-XXXXX-XXXXX
+CODE_RE = re.compile(r'^[A-Z0-9]{5}(?:-[A-Z0-9]{5}){4}$')
+
+test_codes = [
+    'ABCDE-ABCDE-ABCDE-ABCDE-ABCDE',
+    '12345-12345-12345-12345-12345',
+    'TEST1-2TEST-3TEST-4TEST-5TEST',
+    '-BCDE-ABCDE-ABCDE-ABCDE-ABCDE',
+    'ABCDE-ABCDE-ABCDE-ABCDE-ABC-E',
+    'ABCDE-ABCDE-ABCDE-ABCDE-ABCD-',
+    'ABCDE-ABCDE-ABCDE-ABCDE',
+    'ABCDE-ABCDE-ABCDE-ABCDE-ABCDEF',
+    'abcde-ABCDE-ABCDE-ABCDE-ABCDE',
+    'ÄBCDE-ABCDE-ABCDE-ABCDE-ABCDE',
+    'ABCDE ABCDE ABCDE ABCDE ABCDE',
+    '',
+]
+
+
+def test_is_valid_code_matches_regex():
+    for code in test_codes:
+        assert _is_valid_code(code) == bool(CODE_RE.match(code)), code
+
+
+if __name__ == "__main__":
+    print("Testing shift code validation...")
+    test_is_valid_code_matches_regex()
+    print(f"All {len(test_codes)} codes validated the same as the reference regex")
@@ -4,19 +4,19 @@ Test script to verify email functionality with improved formatting.
 """
 
 import os
-from scraper import send_email_notification, format_email_body, format_email_body_plain
+from scraper import ShiftCode, send_email_notification, format_email_body, format_email_body_plain
 
 # Set test recipient (use your actual email from .env)
 recipient_email = os.getenv('RECIPIENT_EMAIL', 'test@example.com')
 
 # Create mock new codes
 test_codes = [
-    {
-        'code': 'TEST1-2TEST-3TEST-4TEST-5TEST',
-        'reward': '3 Golden Key',
-        'added_date': 'Nov 20, 2025',
-        'expire_date': 'Nov 27, 2025'
-    }
+    ShiftCode(
+        code='TEST1-2TEST-3TEST-4TEST-5TEST',
+        reward='3 Golden Key',
+        added_date='Nov 20, 2025',
+        expire_date='Nov 27, 2025'
+    )
 ]
 
 print("Testing email formatting...")
@@ -41,7 +41,7 @@ if recipient_email == 'test@example.com':
     print("Skipping actual email send.")
 else:
     try:
-        send_email_notification(test_codes, recipient_email)
+        send_email_notification(test_codes, [recipient_email])
         print(f"\n✅ Test email sent successfully to {recipient_email}!")
         print("Check your inbox (and spam folder) to verify the improved formatting.")
     except Exception as e:
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Test script to verify streamed parsing handles the charsets servers send in Content-Type.
+"""
+
+from scraper import extract_shift_codes_stream
+
+REWARD = '1 Golden Key'
+CODE = 'ABCDE-FGHIJ-KLMNO-PQRST-UVWXY'
+
+# (charset from the Content-Type header, codec the page is actually encoded with, non-ASCII text in the page)
+test_charsets = [
+    ('utf-8', 'utf-8', 'Gølden ключ'),
+    ('UTF-8', 'utf-8', 'Gølden'),
+    ('latin_1', 'latin-1', 'Gølden'),
+    ('iso8859_15', 'iso8859-15', 'Gølden €'),
+    ('utf-8-sig', 'utf-8-sig', 'Gølden'),
+    ('koi8_r', 'koi8-r', 'ключ'),
+    ('mac-roman', 'mac-roman', 'Gølden'),
+    ('us-ascii', 'utf-8', 'Gølden'),
+    ('made-up-charset', 'utf-8', 'Gølden'),
+    (None, 'utf-8', 'Gølden'),
+]
+
+
+def build_page(extra: str) -> str:
+    return (
+        '<html><head><meta charset="utf-8"></head><body>'
+        f'<p>{extra}</p>'
+        '<h2>Every Borderlands 4 SHiFT Code for Golden Keys</h2>'
+        '<figure><table>'
+        '<tr><th>Reward</th><th>Added</th><th>Code</th><th>Expires</th></tr>'
+        f'<tr><td>{REWARD}</td><td>Nov 20, 2025</td><td><code>{CODE}</code></td><td>Nov 27, 2025</td></tr>'
+        '</table></figure>'
+        '</body></html>'
+    )
+
+
+def test_stream_charsets():
+    for charset, codec, extra in test_charsets:
+        page = build_page(extra).encode(codec)
+        chunks = [page[i:i + 7] for i in range(0, len(page), 7)]
+        codes = extract_shift_codes_stream(chunks, charset)
+        assert [c.code for c in codes] == [CODE], charset
+        assert codes[0].reward == REWARD, charset
+
+
+if __name__ == "__main__":
+    print("Testing streamed parsing under different charsets...")
+    test_stream_charsets()
+    print(f"All {len(test_charsets)} charsets parsed correctly")